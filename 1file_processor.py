@@ -92,26 +92,26 @@ def _extract_docx(data: bytes, heading_criteria: Dict[str, Dict[str, Any]]) -> L
         except Exception as e:
             logger.error(f"NLTK tokenization fail P{i}: {e}",exc_info=True); nltk_sentences=[para_text_cleaned] if para_text_cleaned else []
 
+        # Determine the context for this paragraph's NLTK sentences before any potential split
+        # If the paragraph itself was a heading, that's the primary context.
+        # Otherwise, it inherits from the active contexts.
+        # These are paragraph-constant, so resolve them once rather than per sentence.
+        current_sent_ch_context = text_if_para_is_chapter_heading if para_is_chapter_heading_flag else active_chapter_context
+        current_sent_subch_context = text_if_para_is_subchapter_heading if para_is_subchapter_heading_flag else active_subchapter_context
+
+        # Sub-chapter heading text to look for inside this paragraph's sentences (None = no sub-sentence split)
+        heading_text_to_find: Optional[str] = text_if_para_is_subchapter_heading if para_is_subchapter_heading_flag else None
+
         sent_idx_counter = 0
         for orig_sent_idx, sent_text_from_nltk in enumerate(nltk_sentences):
             current_segment = sent_text_from_nltk.strip()
             if not current_segment: continue
 
-            # Determine the context for this NLTK sentence before any potential split
-            # If the paragraph itself was a heading, that's the primary context.
-            # Otherwise, it inherits from the active contexts.
-            current_sent_ch_context = text_if_para_is_chapter_heading if para_is_chapter_heading_flag else active_chapter_context
-            current_sent_subch_context = text_if_para_is_subchapter_heading if para_is_subchapter_heading_flag else active_subchapter_context
-
-
             # --- Experimental Sub-Sentence Split Logic ---
             # If this paragraph ITSELF was identified as a sub-chapter heading (e.g., para_text_cleaned IS "Some Sayings of the Prophet")
             # AND the NLTK sentence `current_segment` contains this heading text but not at the start.
             # This means NLTK combined pre-heading text with the heading text within this sub-chapter paragraph.
-            if para_is_subchapter_heading_flag and text_if_para_is_subchapter_heading:
-                # `text_if_para_is_subchapter_heading` is the actual heading text of this paragraph.
-                heading_text_to_find = text_if_para_is_subchapter_heading
-                
+            if heading_text_to_find:
                 try:
                     # Find where the actual heading text starts within the current NLTK sentence
                     # Using a simple find; regex might be more robust if heading text has special chars
@@ -1,26 +1,28 @@
 import streamlit as st
-import pandas as pd
-import io
 import logging
+import os
+from pathlib import Path
 # The incorrect import that was here has been REMOVED.
 
 # --- Setup Logging and Helpers ---
+# INFO by default; set APP_LOG_LEVEL=DEBUG to get per-paragraph match reasons and per-chunk details.
+LOG_LEVEL = (os.environ.get("APP_LOG_LEVEL") or "INFO").upper()
+invalid_log_level = None
+if not isinstance(logging.getLevelName(LOG_LEVEL), int): # getLevelName maps known level names to their number
+    invalid_log_level, LOG_LEVEL = LOG_LEVEL, "INFO"
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=LOG_LEVEL,
     format="%(asctime)s | %(levelname)-8s | %(name)-20s | %(module)s:%(lineno)d | %(message)s",
     force=True
 )
 logger_app = logging.getLogger(__name__)
-logger_app.debug("app.py: Logging configured at DEBUG level.")
+if invalid_log_level is not None:
+    logger_app.warning("app.py: Unknown APP_LOG_LEVEL %r; using INFO.", invalid_log_level)
+logger_app.debug("app.py: Logging configured at %s level.", LOG_LEVEL)
 
 try:
-    from utils import ensure_nltk_punkt, load_tokenizer
-    from file_processor import extract_sentences_with_structure
-    from chunker import chunk_structured_sentences, chunk_by_chapter # This is the correct import
-    
-    fp_logger = logging.getLogger('file_processor')
-    fp_logger.setLevel(logging.DEBUG) 
-    logger_app.debug(f"app.py: Logger '{fp_logger.name}' set to DEBUG. Effective level: {logging.getLevelName(fp_logger.getEffectiveLevel())}")
+    from utils import ensure_nltk_punkt, load_tokenizer, extract_and_chunk, dataframe_to_csv_bytes
+    from file_processor import HeadingCriteria
 
 except ImportError as ie:
     logger_app.error(f"app.py: Failed to import necessary modules. Error: {ie}", exc_info=True)
@@ -38,9 +40,9 @@ except Exception as page_setup_err:
      st.stop()
 
 # --- Initialize Session State ---
-if 'processed_data' not in st.session_state: st.session_state.processed_data = None
-if 'processed_filename' not in st.session_state: st.session_state.processed_filename = None
-if 'uploaded_file_info' not in st.session_state: st.session_state.uploaded_file_info = None
+SESSION_STATE_KEYS = ('processed_data', 'processed_filename', 'uploaded_file_info', 'processed_inputs_key')
+for session_key in SESSION_STATE_KEYS:
+    st.session_state.setdefault(session_key, None)
 
 try:
     ensure_nltk_punkt()
@@ -63,14 +65,16 @@ with st.sidebar:
     )
 
     if uploaded_file_widget is not None:
+        # Streamlit gives every upload its own file_id, so a re-upload of an edited file with the
+        # same name and size is still seen as new, without reading or hashing the bytes.
         if st.session_state.uploaded_file_info is None or \
-           st.session_state.uploaded_file_info['name'] != uploaded_file_widget.name or \
-           st.session_state.uploaded_file_info['size'] != uploaded_file_widget.size:
+           st.session_state.uploaded_file_info['file_id'] != uploaded_file_widget.file_id:
+             # Metadata only: the file bytes stay in the uploader and are read when processing starts.
              st.session_state.uploaded_file_info = {
                  "name": uploaded_file_widget.name, "size": uploaded_file_widget.size,
-                 "type": uploaded_file_widget.type, "getvalue": uploaded_file_widget.getvalue()
+                 "type": uploaded_file_widget.type, "file_id": uploaded_file_widget.file_id
              }
-             st.session_state.processed_data = None; st.session_state.processed_filename = None
+             st.session_state.processed_data = None; st.session_state.processed_filename = None; st.session_state.processed_inputs_key = None
              st.success(f"File selected: {st.session_state.uploaded_file_info['name']} ({st.session_state.uploaded_file_info['size'] / 1024:.1f} KB)")
 
     if st.session_state.uploaded_file_info:
@@ -89,6 +93,7 @@ with st.sidebar:
         chunk_mode = st.radio("Chunk by:", ("~200 Tokens", "Chapter Title"), index=0, key="chunk_mode_fs_cen")
         st.subheader("Output Options")
         include_marker = st.checkbox("Include Source Marker?", value=True, key="include_marker_fs_cen")
+        gzip_download = st.checkbox("Compress download (.csv.gz)?", value=False, key="gzip_download_fs_cen")
         st.markdown("---")
         process_button = st.button("🚀 Process File", type="primary", key="process_button_fs_cen")
     else:
@@ -99,82 +104,91 @@ if process_button:
     logger_app.info("app.py: Process button clicked.")
     file_info = st.session_state.uploaded_file_info
     if not file_info: st.error("Error: No file information found."); st.stop()
-    filename, file_content = file_info['name'], file_info['getvalue']
+    if uploaded_file_widget is None: st.error("Error: The uploaded file is no longer available. Please upload it again."); st.stop()
+    filename = file_info['name']
 
-    ch_heading_criteria = {
-        'min_font_size': st.session_state.ch_min_font_size_fs_cen,
-        'alignment_centered': True, 
-    }
-    logger_app.debug(f"app.py: Chapter criteria: {ch_heading_criteria}")
+    ch_heading_criteria = HeadingCriteria(min_font_size=st.session_state.ch_min_font_size_fs_cen)
+    logger_app.debug("app.py: Chapter criteria: %s", ch_heading_criteria)
 
-    sch_heading_criteria = {}
+    sch_heading_criteria = None
     if st.session_state.sch_enable_detection_fs_cen:
-        sch_heading_criteria = {
-            'min_font_size': st.session_state.sch_min_font_size_fs_cen,
-            'alignment_centered': True, 
-        }
-    logger_app.debug(f"app.py: Sub-chapter criteria (enabled: {st.session_state.sch_enable_detection_fs_cen}): {sch_heading_criteria}")
+        sch_heading_criteria = HeadingCriteria(min_font_size=st.session_state.sch_min_font_size_fs_cen)
+    logger_app.debug("app.py: Sub-chapter criteria (enabled: %s): %s", st.session_state.sch_enable_detection_fs_cen, sch_heading_criteria)
 
     combined_heading_criteria = {"chapter": ch_heading_criteria, "sub_chapter": sch_heading_criteria}
 
-    with st.spinner(f"Processing '{filename}'..."):
-        try:
-            structured_sentences = extract_sentences_with_structure(
-                file_content=file_content, filename=filename, heading_criteria=combined_heading_criteria
-            )
-            logger_app.info(f"Extraction: {len(structured_sentences)} segments.")
-            chunks = [] 
-            if not structured_sentences:
-                st.warning("No text segments extracted.")
-            else:
-                if st.session_state.chunk_mode_fs_cen == "~200 Tokens":
-                    chunks = chunk_structured_sentences(
-                        structured_data=structured_sentences, tokenizer=tokenizer,
-                        target_tokens=TARGET_TOKENS, overlap_sentences=OVERLAP_SENTENCES
-                    )
-                else: 
-                    chunks = chunk_by_chapter(structured_data=structured_sentences)
-                logger_app.info(f"Chunking: {len(chunks)} chunks.")
-
-            df_columns = ['Text Chunk', 'Source Marker', 'Detected Chapter', 'Detected Sub-Chapter']
-            if chunks:
-                df = pd.DataFrame(chunks, columns=['chunk_text', 'marker', 'title', 'sub_title'])
-                df.fillna({'title': "Unknown Chapter", 'sub_title': ""}, inplace=True)
-                df.rename(columns={'chunk_text': 'Text Chunk', 'marker': 'Source Marker',
-                                   'title': 'Detected Chapter', 'sub_title': 'Detected Sub-Chapter'}, inplace=True)
-            else:
-                 df = pd.DataFrame(columns=df_columns) 
-                 st.warning("No chunks created." if structured_sentences else "No text segments extracted.")
-            
-            display_cols = ['Text Chunk', 'Detected Chapter', 'Detected Sub-Chapter']
-            if st.session_state.include_marker_fs_cen and 'Source Marker' in df.columns:
-                display_cols.insert(1, 'Source Marker')
-            
-            final_df = pd.DataFrame(columns=display_cols) 
-            for col in display_cols:
-                if col in df.columns: final_df[col] = df[col]
-
-            st.session_state.processed_data = final_df
-            st.session_state.processed_filename = filename.split('.')[0]
-            st.success(f"✅ Processing complete for '{filename}'!")
-
-        except Exception as e:
-            logger_app.error(f"Processing error for {filename}: {e}", exc_info=True)
-            st.error(f"An error during processing: {e}")
-            st.session_state.processed_data = None
+    # Everything that shapes the result. The upload's file_id identifies its bytes, so re-clicking Process
+    # with unchanged inputs keeps the result without reading or hashing the file again.
+    processed_inputs_key = (file_info['file_id'], combined_heading_criteria, st.session_state.chunk_mode_fs_cen,
+                            st.session_state.include_marker_fs_cen, TARGET_TOKENS, OVERLAP_SENTENCES)
 
-if st.session_state.processed_data is not None:
+    if st.session_state.processed_data is not None and st.session_state.processed_inputs_key == processed_inputs_key:
+        logger_app.info("app.py: Inputs unchanged since last run; keeping the current result.")
+        st.info(f"'{filename}' was already processed with these settings.")
+    else:
+        import pandas as pd # Deferred until a file is processed, keeping it off the cold-start path
+
+        file_content = uploaded_file_widget.getvalue()
+        with st.spinner(f"Processing '{filename}'..."):
+            try:
+                n_sentences, chunks = extract_and_chunk(
+                    file_content, filename, combined_heading_criteria,
+                    st.session_state.chunk_mode_fs_cen == "~200 Tokens", TARGET_TOKENS, OVERLAP_SENTENCES,
+                    tokenizer
+                )
+                logger_app.info(f"Extraction: {n_sentences} segments.")
+                if not n_sentences:
+                    st.warning("No text segments extracted.")
+                else:
+                    logger_app.info(f"Chunking: {len(chunks['chunk_text'])} chunks.")
+                    if not chunks['chunk_text']:
+                        st.warning("No chunks created.")
+
+                # Build the display frame once, straight from the chunker's columns: only the shown
+                # columns are materialized, and titles (repeated across every chunk of a chapter)
+                # go straight into categoricals instead of object columns.
+                # Text columns are Arrow-backed strings, which the Arrow CSV writer reads without conversion.
+                display_columns = {'Text Chunk': pd.array(chunks['chunk_text'], dtype="string[pyarrow]")}
+                if st.session_state.include_marker_fs_cen:
+                    display_columns['Source Marker'] = pd.array(chunks['marker'], dtype="string[pyarrow]")
+                display_columns['Detected Chapter'] = pd.Categorical(
+                    [t if t is not None else "Unknown Chapter" for t in chunks['title']])
+                display_columns['Detected Sub-Chapter'] = pd.Categorical(
+                    [t if t is not None else "" for t in chunks['sub_title']])
+                final_df = pd.DataFrame(display_columns)
+
+                st.session_state.processed_data = final_df
+                st.session_state.processed_filename = Path(filename).stem
+                st.session_state.processed_inputs_key = processed_inputs_key
+                st.success(f"✅ Processing complete for '{filename}'!")
+
+            except Exception as e:
+                logger_app.error(f"Processing error for {filename}: {e}", exc_info=True)
+                st.error(f"An error during processing: {e}")
+                st.session_state.processed_data = None; st.session_state.processed_inputs_key = None
+
+# --- Results ---
+# A fragment, so clicking the download button reruns only this block instead of the whole script.
+@st.experimental_fragment
+def show_processed_chunks():
     st.header("📊 Processed Chunks")
-    st.dataframe(st.session_state.processed_data, use_container_width=True)
+    st.dataframe(st.session_state.processed_data, use_container_width=True, hide_index=True)
     if not st.session_state.processed_data.empty:
         st.info(f"Total Chunks: {len(st.session_state.processed_data)}")
         try:
-            csv_data = st.session_state.processed_data.to_csv(index=False).encode('utf-8')
-            st.download_button("📥 Download CSV", csv_data, f"{st.session_state.processed_filename}_chunks.csv", 'text/csv', key="dl_btn_fs_cen") 
+            if st.session_state.get("gzip_download_fs_cen", False):
+                csv_data = dataframe_to_csv_bytes(st.session_state.processed_data, gzip_compress=True)
+                st.download_button("📥 Download CSV (gzip)", csv_data, f"{st.session_state.processed_filename}_chunks.csv.gz", 'application/gzip', key="dl_btn_fs_cen")
+            else:
+                csv_data = dataframe_to_csv_bytes(st.session_state.processed_data)
+                st.download_button("📥 Download CSV", csv_data, f"{st.session_state.processed_filename}_chunks.csv", 'text/csv', key="dl_btn_fs_cen") 
         except Exception as e:
             logger_app.error(f"Download prep error: {e}", exc_info=True)
             st.error(f"Failed to prepare download: {e}")
     else: st.info("0 chunks produced.")
+
+if st.session_state.processed_data is not None:
+    show_processed_chunks()
 elif st.session_state.uploaded_file_info is None:
      st.markdown("---")
      st.markdown("Upload a DOCX file and set font sizes in the sidebar.")
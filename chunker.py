@@ -1,55 +1,88 @@
 import tiktoken
 import logging
-from typing import List, Tuple, Optional
+import os
+from itertools import accumulate
+from typing import Any, Dict, List, Optional
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_CHAPTER_TITLE_CHUNK = "Introduction" 
 DEFAULT_SUBCHAPTER_TITLE_CHUNK = None    
+# tiktoken encodes batches on a thread pool (the Rust encoder releases the GIL). Every Process click in every
+# session gets its own pool, so use the cores we may run on but never more than tiktoken's default of 8.
+ENCODE_BATCH_MAX_THREADS = 8
+ENCODE_BATCH_THREADS = min(ENCODE_BATCH_MAX_THREADS,
+                           len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1))
+
+# Columns of the chunk table returned by both chunkers (one list per column, one row per chunk)
+CHUNK_COLUMNS = ('chunk_text', 'marker', 'title', 'sub_title')
+Chunks = Dict[str, List[Any]]
+
+def empty_chunks() -> Chunks:
+    return {column: [] for column in CHUNK_COLUMNS}
+
+def _append_chunk(chunks: Chunks, chunk_text: str, marker: str, title: Optional[str], sub_title: Optional[str]) -> None:
+    chunks['chunk_text'].append(chunk_text)
+    chunks['marker'].append(marker)
+    chunks['title'].append(title)
+    chunks['sub_title'].append(sub_title)
+
+def _sentence_token_counts(tokenizer: tiktoken.Encoding, sentence_texts: List[str]) -> List[int]:
+    """Token count per sentence, encoding each distinct sentence text only once.
+
+    Repeated lines (headers, scripture refs, "* * *" separators, ...) share one encode.
+    """
+    distinct_texts = list(dict.fromkeys(sentence_texts))
+    count_by_text = {text: len(tokens) for text, tokens in
+                     zip(distinct_texts, tokenizer.encode_batch(distinct_texts, num_threads=ENCODE_BATCH_THREADS, allowed_special="all"))}
+    return [count_by_text[text] for text in sentence_texts]
 
 def chunk_structured_sentences(
-    structured_data: List[Tuple[str, str, bool, bool, Optional[str], Optional[str]]], 
-    # sentence, marker, is_para_ch_hd_flag, is_para_subch_hd_flag, ch_context_for_sentence, subch_context_for_sentence
+    structured_data: Dict[str, List[Any]], 
+    # Columns (see file_processor.SENTENCE_COLUMNS): text, marker, is_ch, is_sch, ch_ctx, sch_ctx
     tokenizer: tiktoken.Encoding,
     target_tokens: int = 200,
     overlap_sentences: int = 2
-) -> List[Tuple[str, str, Optional[str], Optional[str]]]:
-    chunks = []
+) -> Chunks:
+    chunks = empty_chunks()
     current_chunk_sentences = []
     current_chunk_markers = []
     current_chunk_assigned_chapter_title: Optional[str] = None
     current_chunk_assigned_sub_chapter_title: Optional[str] = None
     current_token_count = 0
 
-    if not structured_data:
+    if not structured_data or not structured_data['text']:
         logger.warning("chunk_structured_sentences: No structured data, returning empty.")
-        return []
+        return chunks
+
+    sentence_texts, sentence_markers = structured_data['text'], structured_data['marker']
+    para_is_ch_hd_flags, para_is_subch_hd_flags = structured_data['is_ch'], structured_data['is_sch']
+    sentence_ch_contexts, sentence_subch_contexts = structured_data['ch_ctx'], structured_data['sch_ctx']
+    n_sentences = len(sentence_texts)
 
     logger.info(f"Token chunking (Target: ~{target_tokens}, Overlap: {overlap_sentences} sents), with 'peek ahead' for heading paragraphs.")
 
     try:
-        sentence_texts = [item[0] for item in structured_data]
-        all_tokens = tokenizer.encode_batch(sentence_texts, allowed_special="all")
-        sentence_token_counts = [len(tokens) for tokens in all_tokens]
+        sentence_token_counts = _sentence_token_counts(tokenizer, sentence_texts)
     except Exception as e:
-        logger.error(f"Tiktoken encoding error: {e}", exc_info=True); return []
+        logger.error(f"Tiktoken encoding error: {e}", exc_info=True); return chunks
+
+    # Prefix sums of the token counts: sentences [a, b) hold token_prefix[b] - token_prefix[a] tokens
+    token_prefix = list(accumulate(sentence_token_counts, initial=0))
 
     # --- Main Loop ---
     i = 0
-    while i < len(structured_data):
-        sentence, marker, para_is_ch_hd, para_is_subch_hd, \
-            sentence_ch_context, sentence_subch_context = structured_data[i]
-        
-        if i >= len(sentence_token_counts): # Should not happen if lengths match
-            logger.warning(f"Data/token count mismatch at index {i}. Ending.")
-            break 
+    while i < n_sentences:
+        sentence, marker = sentence_texts[i], sentence_markers[i]
+        sentence_ch_context, sentence_subch_context = sentence_ch_contexts[i], sentence_subch_contexts[i]
         sentence_tokens = sentence_token_counts[i]
 
         # --- Initialize titles for a new chunk ---
         if not current_chunk_sentences:
             current_chunk_assigned_chapter_title = sentence_ch_context if sentence_ch_context is not None else DEFAULT_CHAPTER_TITLE_CHUNK
             current_chunk_assigned_sub_chapter_title = sentence_subch_context
-            logger.debug(f"  Starting new chunk with sentence '{marker}'. Initial titles: Ch='{current_chunk_assigned_chapter_title}', SubCh='{current_chunk_assigned_sub_chapter_title}'")
+            logger.debug("  Starting new chunk with sentence '%s'. Initial titles: Ch='%s', SubCh='%s'",
+                         marker, current_chunk_assigned_chapter_title, current_chunk_assigned_sub_chapter_title)
 
         # --- Add current sentence to potential chunk ---
         current_chunk_sentences.append(sentence)
@@ -66,7 +99,7 @@ def chunk_structured_sentences(
              # This check is tricky. The original logic was: if (current_token_count + next_sentence_tokens > target_tokens)
              # For now, let's use a simpler: if current chunk hits target.
              # More refined: if adding the *next* sentence would exceed, unless this is the last sentence.
-            if i + 1 < len(structured_data):
+            if i + 1 < n_sentences:
                 next_sentence_tokens = sentence_token_counts[i+1]
                 if (current_token_count + next_sentence_tokens > target_tokens and current_token_count > target_tokens * 0.6): # if current chunk is already substantial
                     finalize_chunk_now = True
@@ -78,10 +111,11 @@ def chunk_structured_sentences(
 
         # 2. "Peek Ahead" for heading if current sentence ends with a full stop
         #    and the next sentence starts a new paragraph that is a heading.
-        if not finalize_chunk_now and sentence.strip().endswith("."):
-            if (i + 1) < len(structured_data): # If there is a next sentence
-                _next_s, next_marker, next_para_is_ch_hd, next_para_is_subch_hd, \
-                next_s_ch_ctx, next_s_subch_ctx = structured_data[i+1]
+        if not finalize_chunk_now and sentence.endswith("."): # Sentences arrive stripped from the extractor
+            if (i + 1) < n_sentences: # If there is a next sentence
+                next_marker = sentence_markers[i+1]
+                next_para_is_ch_hd, next_para_is_subch_hd = para_is_ch_hd_flags[i+1], para_is_subch_hd_flags[i+1]
+                next_s_ch_ctx, next_s_subch_ctx = sentence_ch_contexts[i+1], sentence_subch_contexts[i+1]
                 
                 if next_marker.endswith(".s0"): # Next sentence is start of a new paragraph
                     is_new_context_ch = next_para_is_ch_hd and (next_s_ch_ctx != current_chunk_assigned_chapter_title)
@@ -97,7 +131,7 @@ def chunk_structured_sentences(
                         reason_for_finalize = f"Next Para is New SubChapter ('{next_s_subch_ctx[:30]}...')"
         
         # 3. If this is the last sentence in the data, always finalize the current chunk.
-        if i == len(structured_data) - 1:
+        if i == n_sentences - 1:
             finalize_chunk_now = True
             reason_for_finalize = reason_for_finalize if reason_for_finalize else "End of Data"
 
@@ -105,8 +139,10 @@ def chunk_structured_sentences(
         if finalize_chunk_now and current_chunk_sentences:
             chunk_text = " ".join(current_chunk_sentences)
             first_marker = current_chunk_markers[0]
-            chunks.append((chunk_text, first_marker, current_chunk_assigned_chapter_title, current_chunk_assigned_sub_chapter_title))
-            logger.info(f"Created chunk (ending '{marker}'). Segments: {len(current_chunk_sentences)}, Tokens: {current_token_count}. Reason: {reason_for_finalize}. Ch: '{current_chunk_assigned_chapter_title}', SubCh: '{current_chunk_assigned_sub_chapter_title}'")
+            _append_chunk(chunks, chunk_text, first_marker, current_chunk_assigned_chapter_title, current_chunk_assigned_sub_chapter_title)
+            logger.debug("Created chunk (ending '%s'). Segments: %d, Tokens: %d. Reason: %s. Ch: '%s', SubCh: '%s'",
+                        marker, len(current_chunk_sentences), current_token_count, reason_for_finalize,
+                        current_chunk_assigned_chapter_title, current_chunk_assigned_sub_chapter_title)
 
             # Prepare for the next chunk
             # The sentence that *would have been added* (i.e. structured_data[i+1] if split happened due to peek-ahead)
@@ -117,34 +153,20 @@ def chunk_structured_sentences(
             # So, the overlap should start from `i - overlap_sentences + 1`.
             # The items for overlap are from `current_chunk_sentences`.
             
-            # Start index for sentences in `structured_data` that formed the previous chunk
-            start_idx_prev_chunk_in_structured_data = i - len(current_chunk_sentences) + 1
-
             temp_sentences_for_overlap = []
             temp_markers_for_overlap = []
             temp_overlap_token_count = 0
 
             if overlap_sentences > 0 and len(current_chunk_sentences) >= overlap_sentences :
-                # Get sentences from the end of the *just finalized chunk* for overlap
-                overlap_source_sentences = current_chunk_sentences[-overlap_sentences:]
-                overlap_source_markers = current_chunk_markers[-overlap_sentences:]
-                
-                # Get their token counts
-                # The original indices of these overlap sentences
-                original_indices_of_overlap_source = list(range(start_idx_prev_chunk_in_structured_data + len(current_chunk_sentences) - overlap_sentences, 
-                                                                start_idx_prev_chunk_in_structured_data + len(current_chunk_sentences)))
-                
-                for k_idx, orig_idx in enumerate(original_indices_of_overlap_source):
-                    if orig_idx >=0 and orig_idx < len(sentence_token_counts):
-                        temp_sentences_for_overlap.append(overlap_source_sentences[k_idx])
-                        temp_markers_for_overlap.append(overlap_source_markers[k_idx])
-                        temp_overlap_token_count += sentence_token_counts[orig_idx]
-                    else:
-                        logger.warning(f"Overlap: Original index {orig_idx} out of bounds.")
+                # The chunk covers consecutive sentences ending at `i`, so its last `overlap_sentences`
+                # are indices i-overlap+1..i and their token total is one prefix-sum difference.
+                temp_sentences_for_overlap = current_chunk_sentences[-overlap_sentences:]
+                temp_markers_for_overlap = current_chunk_markers[-overlap_sentences:]
+                temp_overlap_token_count = token_prefix[i + 1] - token_prefix[i + 1 - overlap_sentences]
             
             # Reset for the next chunk
-            current_chunk_sentences = list(temp_sentences_for_overlap) # Start with overlap
-            current_chunk_markers = list(temp_markers_for_overlap)
+            current_chunk_sentences = temp_sentences_for_overlap # Start with overlap
+            current_chunk_markers = temp_markers_for_overlap
             current_token_count = temp_overlap_token_count
             current_chunk_assigned_chapter_title = None # Will be set by the next sentence
             current_chunk_assigned_sub_chapter_title = None 
@@ -165,27 +187,29 @@ def chunk_structured_sentences(
         # Ensure titles are not None if they were established for this last chunk
         final_ch_title = current_chunk_assigned_chapter_title if current_chunk_assigned_chapter_title is not None else DEFAULT_CHAPTER_TITLE_CHUNK
         final_subch_title = current_chunk_assigned_sub_chapter_title
-        chunks.append((chunk_text, current_chunk_markers[0], final_ch_title, final_subch_title))
+        _append_chunk(chunks, chunk_text, current_chunk_markers[0], final_ch_title, final_subch_title)
         logger.info(f"Created final remaining chunk. Tokens: {current_token_count}. Ch: '{final_ch_title}', SubCh: '{final_subch_title}'")
 
-    logger.info(f"Token chunking (peek ahead) finished. Total chunks: {len(chunks)}.")
+    logger.info(f"Token chunking (peek ahead) finished. Total chunks: {len(chunks['chunk_text'])}.")
     return chunks
 
-# chunk_by_chapter (remains the same as the last correct version that handles 6-tuples)
+# chunk_by_chapter (same logic as the 6-tuple version, reading the columnar sentence table)
 def chunk_by_chapter(
-    structured_data: List[Tuple[str, str, bool, bool, Optional[str], Optional[str]]] 
-) -> List[Tuple[str, str, Optional[str], Optional[str]]]:
-    chunks = []
+    structured_data: Dict[str, List[Any]] 
+) -> Chunks:
+    chunks = empty_chunks()
     current_chunk_sentences = []
     current_chunk_markers = []
     current_chapter_for_chunk: Optional[str] = None 
     first_sub_chapter_in_current_chunk: Optional[str] = None
     active_chapter_heading_text_para: Optional[str] = None 
 
-    if not structured_data: return []
+    if not structured_data or not structured_data['text']: return chunks
     logger.info("Starting chunking by chapter (using heading flags).")
 
-    for i, (sentence, marker, is_para_ch_hd, is_para_subch_hd, ch_context_of_sentence, subch_context_of_sentence) in enumerate(structured_data):
+    rows = zip(structured_data['text'], structured_data['marker'], structured_data['is_ch'],
+               structured_data['is_sch'], structured_data['ch_ctx'], structured_data['sch_ctx'])
+    for i, (sentence, marker, is_para_ch_hd, is_para_subch_hd, ch_context_of_sentence, subch_context_of_sentence) in enumerate(rows):
         is_new_chapter_boundary = False
         is_first_sentence_of_para = marker.endswith(".s0")
 
@@ -196,9 +220,9 @@ def chunk_by_chapter(
         if is_new_chapter_boundary:
             if current_chunk_sentences: 
                 chunk_text = " ".join(current_chunk_sentences)
-                chunks.append((chunk_text, current_chunk_markers[0], 
-                               current_chapter_for_chunk if current_chapter_for_chunk else DEFAULT_CHAPTER_TITLE_CHUNK, 
-                               first_sub_chapter_in_current_chunk))
+                _append_chunk(chunks, chunk_text, current_chunk_markers[0], 
+                              current_chapter_for_chunk if current_chapter_for_chunk else DEFAULT_CHAPTER_TITLE_CHUNK, 
+                              first_sub_chapter_in_current_chunk)
             current_chunk_sentences, current_chunk_markers = [], []
             current_chapter_for_chunk = ch_context_of_sentence 
             active_chapter_heading_text_para = ch_context_of_sentence
@@ -215,8 +239,8 @@ def chunk_by_chapter(
         
     if current_chunk_sentences:
         chunk_text = " ".join(current_chunk_sentences)
-        chunks.append((chunk_text, current_chunk_markers[0], 
-                       current_chapter_for_chunk if current_chapter_for_chunk else DEFAULT_CHAPTER_TITLE_CHUNK, 
-                       first_sub_chapter_in_current_chunk))
-    logger.info(f"Chunking by chapter finished. Total chunks: {len(chunks)}.")
+        _append_chunk(chunks, chunk_text, current_chunk_markers[0], 
+                      current_chapter_for_chunk if current_chapter_for_chunk else DEFAULT_CHAPTER_TITLE_CHUNK, 
+                      first_sub_chapter_in_current_chunk)
+    logger.info(f"Chunking by chapter finished. Total chunks: {len(chunks['chunk_text'])}.")
     return chunks
@@ -1,87 +1,348 @@
 import docx
 from docx.shared import Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml.ns import nsmap, qn
+from docx.oxml.simpletypes import ST_HpsMeasure
+from lxml import etree
 import io
+import os
 import re 
+import sys
 import nltk
 import logging
-from typing import List, Tuple, Optional, Dict, Any
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+try:
+    import blingfire # Optional native sentence splitter, only used when opted into via APP_SENTENCE_SPLITTER
+except ImportError:
+    blingfire = None
 
 logger = logging.getLogger(__name__)
 
+# Sentence splitter: "punkt" (default) or "blingfire". Punkt and blingfire place some sentence
+# boundaries differently, so the choice changes markers and chunk contents for the same DOCX;
+# blingfire is therefore never picked just because it happens to be installed.
+SENTENCE_SPLITTER_ENV = "APP_SENTENCE_SPLITTER"
+SENTENCE_SPLITTERS = ("punkt", "blingfire")
+
 DEFAULT_CHAPTER_TITLE_FALLBACK = "Introduction" 
 DEFAULT_SUBCHAPTER_TITLE_FALLBACK = None    
 
+# Columns of the structured-sentence table (one list per column, one row per sentence):
+# sentence text, marker, is_para_ch_hd_flag, is_para_subch_hd_flag, ch_context_for_sentence, subch_context_for_sentence
+SENTENCE_COLUMNS = ('text', 'marker', 'is_ch', 'is_sch', 'ch_ctx', 'sch_ctx')
+StructuredSentences = Dict[str, List[Any]]
+
+# Columns of the parsed-paragraph table, which does not depend on heading criteria:
+# cleaned paragraph text, marker base ("para<i>"), largest run font size in pt (0.0 unless centered), paragraph alignment
+RAW_PARAGRAPH_COLUMNS = ('text', 'marker', 'max_fsize_pt', 'alignment')
+RawParagraphs = Dict[str, List[Any]]
+
+@dataclass(frozen=True)
+class HeadingCriteria:
+    """A paragraph is a heading when it is centered and its largest run is at least min_font_size pt."""
+    min_font_size: float
+    alignment_centered: bool = True
+
+# Criteria per heading level ("chapter", "sub_chapter"); None or a missing key disables that level
+HeadingCriteriaByLevel = Dict[str, Optional[HeadingCriteria]]
+
 RE_WS = re.compile(r"\s+")
+PARA_JOINER = "\n\n" # Separator used when all paragraphs are sent to Punkt in one call
+# Paragraph starts with closing quotes/brackets that Punkt's boundary realignment would move onto the
+# previous paragraph's last sentence (see _sent_tokenize_batch). Anchored, with no overlapping repeats.
+RE_PARA_START_CLOSING_PUNCT = re.compile(r"[\"')\]}]+(?:\s|--|$)")
+
+# --- Punkt fast path (see _fast_sentence_split) ---
+FAST_SPLIT_MAX_CHARS = 2000
+RE_FAST_SENT_SPLIT = re.compile(r"(?<=[.!?])\s+")
+# Short words/initials or numbers before a period, ellipses, and end punctuation followed by quotes, brackets or more punctuation
+RE_FAST_SPLIT_UNSAFE = re.compile(r"(?:^|\s)\S{1,4}\.(?=\s|$)|\d\.(?=\s|$)|\.\.|[.!?][\"'\u201d\u2019)\]!?.]")
+RE_PERIOD_FINAL_WORD = re.compile(r"(\S+)\.(?=\s|$)")
+# Punkt's word tokenizer ends a word at these characters and does not start one with the second set,
+# so "(Prof." and '"Prof.' are the token "Prof." to it (see _punkt_word_type)
+RE_PUNKT_NON_WORD_CHAR = re.compile(r"[)\";}\]*:@'({\[!?]")
+PUNKT_NON_WORD_START_CHARS = "(\"`{[:;&#*@)}]-,"
+
+# Enum members are singletons, so the hot comparison can be an identity check against this module constant.
+CENTER_ALIGN = WD_ALIGN_PARAGRAPH.CENTER
+
+# Display names used in rejection reasons for non-centered paragraphs
+ALIGN_NAMES = {
+    WD_ALIGN_PARAGRAPH.LEFT: "LEFT",
+    WD_ALIGN_PARAGRAPH.RIGHT: "RIGHT",
+    WD_ALIGN_PARAGRAPH.JUSTIFY: "JUSTIFY",
+    None: "NOT_SET (likely LEFT)",
+}
+
+# Explicit sizes (w:sz, in half-points) of the paragraph's runs that carry visible text.
+# Same values as Run.font.size for non-blank runs, without building Run/Font/Length objects.
+RUN_FONT_SIZES_XPATH = etree.XPath("./w:r[w:t[normalize-space()]]/w:rPr/w:sz/@w:val", namespaces={'w': nsmap['w']})
+
+# Text-bearing run children of a paragraph, its hyperlinks included, in document order. These are
+# exactly the elements CT_P.text / CT_R.text read, collected by one compiled query per paragraph
+# instead of a fresh string XPath per run; each element's str() is its text equivalent.
+_RUN_TEXT_CHILD = "*[self::w:t or self::w:tab or self::w:br or self::w:cr or self::w:noBreakHyphen or self::w:ptab]"
+PARAGRAPH_TEXT_NODES_XPATH = etree.XPath(
+    f"./w:r/{_RUN_TEXT_CHILD} | ./w:hyperlink/w:r/{_RUN_TEXT_CHILD}", namespaces={'w': nsmap['w']}
+)
+
+def _paragraph_text(p_element) -> str:
+    return "".join(map(str, PARAGRAPH_TEXT_NODES_XPATH(p_element)))
 
 def _clean(raw: str) -> str:
-    txt = raw.replace("\n", " ")
-    return RE_WS.sub(" ", txt).strip()
+    # RE_WS already matches "\n", so one substitution pass collapses all whitespace.
+    return RE_WS.sub(" ", raw).strip()
+
+def _max_run_font_size_pt(p_element) -> float:
+    max_fsize_pt = 0.0
+    for sz_val in RUN_FONT_SIZES_XPATH(p_element):
+        try:
+            fsize_pt = int(sz_val) / 2.0
+        except ValueError: # Universal measure such as "12pt"; let python-docx convert it
+            try: fsize_pt = ST_HpsMeasure.convert_from_xml(sz_val).pt
+            except Exception: continue
+        max_fsize_pt = max(max_fsize_pt, fsize_pt)
+    return max_fsize_pt
+
+@lru_cache(maxsize=1)
+def load_punkt_model():
+    # Loaded lazily (not at import) because app.py imports this module before ensure_nltk_punkt() runs;
+    # ensure_nltk_punkt() then loads it once per process.
+    return nltk.data.load('tokenizers/punkt/english.pickle')
+
+@lru_cache(maxsize=1)
+def _punkt_abbrev_types() -> Optional[Set[str]]:
+    """Punkt's learned abbreviations, or None if this NLTK version keeps them elsewhere.
+
+    They live on the private PunktParameters object, so an NLTK upgrade may move them;
+    callers then fall back to the Punkt path instead of failing.
+    """
+    try:
+        return load_punkt_model()._params.abbrev_types
+    except AttributeError:
+        logger.warning("Punkt abbreviation list not found; regex sentence fast path disabled.")
+        return None
+
+def _punkt_word_type(word: str) -> str:
+    """Lowercased text of the last Punkt word token in word (a whitespace-free chunk before a period)."""
+    return RE_PUNKT_NON_WORD_CHAR.split(word)[-1].lstrip(PUNKT_NON_WORD_START_CHARS).lower()
+
+def _fast_sentence_split(text: str) -> Optional[List[str]]:
+    """Splits plain paragraphs without Punkt; returns None when Punkt is needed.
+
+    A paragraph with no '.', '!' or '?' is one sentence for Punkt too. Short paragraphs whose
+    sentence ends are all unambiguous (no abbreviation, initial, number, ellipsis or closing
+    quote/bracket next to the punctuation) are split with RE_FAST_SENT_SPLIT.
+    """
+    if '.' not in text and '!' not in text and '?' not in text:
+        return [text]
+    if len(text) > FAST_SPLIT_MAX_CHARS or RE_FAST_SPLIT_UNSAFE.search(text):
+        return None
+    abbrev_types = _punkt_abbrev_types()
+    if abbrev_types is None:
+        return None
+    for word in RE_PERIOD_FINAL_WORD.findall(text):
+        # Same abbreviation test as Punkt: the whole word, or its part after the last hyphen ("ex-Gov.")
+        word_type = _punkt_word_type(word)
+        if word_type in abbrev_types or word_type.split("-")[-1] in abbrev_types:
+            return None
+    return RE_FAST_SENT_SPLIT.split(text)
+
+def _ends_in_stacked_punctuation(text: str) -> bool:
+    """True if the trailing run of punctuation (no word chars or spaces) holds two or more of '.', '!', '?'.
+
+    A single backwards scan, so long dot leaders ("Chapter One ........ 12") stay linear.
+    """
+    end_marks = 0
+    for c in reversed(text):
+        if c.isalnum() or c == "_" or c.isspace():
+            break
+        if c in ".!?":
+            end_marks += 1
+            if end_marks >= 2:
+                return True
+    return False
+
+def _sent_tokenize_batch(para_texts: List[str]) -> List[List[str]]:
+    """Splits every paragraph into sentences, same as Punkt's tokenize() on each paragraph.
+
+    Paragraphs are joined with PARA_JOINER, tokenized once via span_tokenize, and the
+    resulting spans are mapped back to their paragraph by character offset. A span that
+    runs across a paragraph boundary (paragraph without final punctuation) is cut there.
+    Two kinds of paragraph get a Punkt call of their own instead, because joining changes
+    how Punkt reads them: stacked end punctuation at the very end of the input ("vol.!",
+    "Dr.?", 'U.S.".', "!!") splits differently from the same characters followed by more
+    text, and leading closing quotes/brackets ('" Wait," she called.') would be realigned
+    onto the previous paragraph's last sentence across PARA_JOINER.
+    """
+    sentences_per_para: List[List[str]] = [[] for _ in para_texts]
+    punkt = load_punkt_model()
+
+    batch_indices = []
+    for p, text in enumerate(para_texts):
+        if _ends_in_stacked_punctuation(text) or RE_PARA_START_CLOSING_PUNCT.match(text):
+            sentences_per_para[p] = [sent.strip() for sent in punkt.tokenize(text) if sent.strip()]
+        else:
+            batch_indices.append(p)
+    batch_texts = [para_texts[p] for p in batch_indices]
+
+    if batch_texts:
+        para_starts, offset = [], 0
+        for text in batch_texts:
+            para_starts.append(offset)
+            offset += len(text) + len(PARA_JOINER)
+        joined = PARA_JOINER.join(batch_texts)
+
+        b = 0 # Index (into batch_texts) of the paragraph the current span position falls in
+        for span_start, span_end in punkt.span_tokenize(joined):
+            pos = span_start
+            while pos < span_end:
+                while b + 1 < len(batch_texts) and pos >= para_starts[b + 1]:
+                    b += 1
+                para_end = para_starts[b] + len(batch_texts[b])
+                if pos >= para_end: # Inside the joiner; jump to the next paragraph
+                    pos = para_starts[b + 1] if b + 1 < len(batch_texts) else span_end
+                    continue
+                piece_end = min(span_end, para_end)
+                piece = joined[pos:piece_end].strip()
+                if piece:
+                    sentences_per_para[batch_indices[b]].append(piece)
+                pos = piece_end
+
+    for p, text in enumerate(para_texts):
+        if not sentences_per_para[p] and text:
+            sentences_per_para[p] = [text]
+    return sentences_per_para
+
+def _blingfire_sent_tokenize_batch(para_texts: List[str]) -> List[List[str]]:
+    """Same contract as _sent_tokenize_batch, split by blingfire (one sentence per output line)."""
+    sentences_per_para: List[List[str]] = []
+    for text in para_texts:
+        sentences = [sent.strip() for sent in blingfire.text_to_sentences(text).split("\n")]
+        sentences_per_para.append([sent for sent in sentences if sent] or [text])
+    return sentences_per_para
+
+def _selected_sentence_splitter() -> str:
+    """Reads APP_SENTENCE_SPLITTER; unknown values, or blingfire without the package, fall back to punkt."""
+    requested = os.environ.get(SENTENCE_SPLITTER_ENV, "punkt").strip().lower()
+    if requested not in SENTENCE_SPLITTERS:
+        logger.warning("Unknown %s=%r; using punkt.", SENTENCE_SPLITTER_ENV, requested)
+        return "punkt"
+    if requested == "blingfire" and blingfire is None:
+        logger.warning("%s=blingfire but blingfire is not installed; using punkt.", SENTENCE_SPLITTER_ENV)
+        return "punkt"
+    return requested
+
+# Backend for paragraphs the regex fast path cannot take. With blingfire, Punkt is never loaded:
+# blingfire takes every body paragraph, since the fast path needs Punkt's abbreviation list.
+SENTENCE_SPLITTER = _selected_sentence_splitter()
+USES_NLTK_PUNKT = SENTENCE_SPLITTER == "punkt"
+_sent_tokenize_backend = _sent_tokenize_batch if USES_NLTK_PUNKT else _blingfire_sent_tokenize_batch
 
 def _matches_criteria_docx_font_size_and_centered(
-    text: str, 
-    para_props: Dict[str, Any], 
-    criteria: Dict[str, Any], 
-    type_label: str
+    max_fsize_pt: float, 
+    alignment: Optional[WD_ALIGN_PARAGRAPH], 
+    criteria: Optional[HeadingCriteria]
 ) -> Tuple[bool, str]:
-    if not criteria or criteria.get('min_font_size') is None or criteria.get('alignment_centered') is not True:
+    if criteria is None or criteria.alignment_centered is not True:
         return False, "Core criteria (min_font_size / alignment_centered) missing or not True"
 
     rejection_reason = "Matches criteria" 
     passes_all_checks = True
     
-    if para_props.get('max_fsize_pt', 0.0) < criteria['min_font_size']:
-        rejection_reason = f"Font size {para_props.get('max_fsize_pt', 0.0):.1f}pt < min {criteria['min_font_size']:.1f}pt"
+    # Alignment first: non-centered paragraphs never get their font size scanned (see extract_raw_paragraphs)
+    if alignment is not CENTER_ALIGN:
+        align_str = ALIGN_NAMES.get(alignment, str(alignment))
+        rejection_reason = f"Alignment: Not Centered (Actual: {align_str})"
         passes_all_checks = False
     
-    if passes_all_checks and para_props.get('alignment') != WD_ALIGN_PARAGRAPH.CENTER:
-        align_val = para_props.get('alignment')
-        align_str = str(align_val) 
-        if align_val == WD_ALIGN_PARAGRAPH.LEFT: align_str = "LEFT"
-        elif align_val == WD_ALIGN_PARAGRAPH.RIGHT: align_str = "RIGHT"
-        elif align_val == WD_ALIGN_PARAGRAPH.JUSTIFY: align_str = "JUSTIFY"
-        elif align_val is None: align_str = "NOT_SET (likely LEFT)" 
-        rejection_reason = f"Alignment: Not Centered (Actual: {align_str})"
+    if passes_all_checks and max_fsize_pt < criteria.min_font_size:
+        rejection_reason = f"Font size {max_fsize_pt:.1f}pt < min {criteria.min_font_size:.1f}pt"
         passes_all_checks = False
         
-    return (passes_all_checks, rejection_reason if not passes_all_checks else f"Matches MinFont ({criteria['min_font_size']:.1f}pt) & Centered")
+    return (passes_all_checks, rejection_reason if not passes_all_checks else f"Matches MinFont ({criteria.min_font_size:.1f}pt) & Centered")
+
+HeadingMatcher = Callable[[float, Optional[WD_ALIGN_PARAGRAPH]], bool]
+
+def _never_matches(max_fsize_pt: float, alignment: Optional[WD_ALIGN_PARAGRAPH]) -> bool:
+    return False
+
+def _build_heading_matcher(criteria: Optional[HeadingCriteria], enabled: bool) -> HeadingMatcher:
+    """Returns the hot-path twin of _matches_criteria_docx_font_size_and_centered.
+
+    The criteria are read once here; the returned predicate only compares its two
+    arguments against CENTER_ALIGN and the captured minimum size (no reason string).
+    """
+    if not enabled:
+        return _never_matches
+    min_font_size = criteria.min_font_size
 
-def _extract_docx(data: bytes, heading_criteria: Dict[str, Dict[str, Any]]) \
-    -> List[Tuple[str, str, bool, bool, Optional[str], Optional[str]]]:
-    ch_criteria = heading_criteria.get("chapter", {})
-    sch_criteria = heading_criteria.get("sub_chapter", {})
+    def matches(max_fsize_pt: float, alignment: Optional[WD_ALIGN_PARAGRAPH]) -> bool:
+        return alignment is CENTER_ALIGN and max_fsize_pt >= min_font_size
+    return matches
 
+def empty_structured_sentences() -> StructuredSentences:
+    return {column: [] for column in SENTENCE_COLUMNS}
+
+def empty_raw_paragraphs() -> RawParagraphs:
+    return {column: [] for column in RAW_PARAGRAPH_COLUMNS}
+
+def extract_raw_paragraphs(data: bytes) -> RawParagraphs:
+    """Parses the DOCX once into criteria-independent paragraph columns.
+
+    This is the expensive part of extraction (XML walk and run font scan) and depends only on
+    the file bytes, so callers may cache it per upload; _apply_heading_criteria does the rest.
+    """
+    raw: RawParagraphs = empty_raw_paragraphs()
     try: 
         doc = docx.Document(io.BytesIO(data))
     except Exception as e: 
         logger.error(f"Failed to open DOCX stream: {e}", exc_info=True)
-        return []
+        return raw
+
+    texts_append, markers_append = raw['text'].append, raw['marker'].append
+    sizes_append, alignments_append = raw['max_fsize_pt'].append, raw['alignment'].append
+    # Walk the body's <w:p> children directly (same paragraphs, same order as doc.paragraphs)
+    # instead of materializing a list of Paragraph wrappers up front.
+    for i, p_element in enumerate(doc.element.body.iterchildren(qn('w:p')), 1):
+        para_full_text_cleaned = _clean(_paragraph_text(p_element)) 
+        if not para_full_text_cleaned: 
+            continue
+        alignment = p_element.alignment
+        texts_append(para_full_text_cleaned)
+        markers_append(f"para{i}")
+        # Headings must be centered, so the run scan is skipped for every other paragraph (most body text)
+        sizes_append(_max_run_font_size_pt(p_element) if alignment is CENTER_ALIGN else 0.0)
+        alignments_append(alignment)
+    logger.info("--- DOCX parsed: %d non-empty paragraphs ---", len(raw['text']))
+    return raw
+
+def _apply_heading_criteria(raw: RawParagraphs, heading_criteria: HeadingCriteriaByLevel) -> StructuredSentences:
+    ch_criteria = heading_criteria.get("chapter")
+    sch_criteria = heading_criteria.get("sub_chapter")
+    # Criteria are fixed for the whole document, so resolve which detectors are active once.
+    # Sub-chapters must use a smaller minimum size than chapters (when chapters are detected).
+    ch_detection_enabled = ch_criteria is not None and ch_criteria.alignment_centered is True
+    sch_detection_enabled = sch_criteria is not None and sch_criteria.alignment_centered is True \
+        and (not ch_detection_enabled or sch_criteria.min_font_size < ch_criteria.min_font_size)
+    is_chapter_heading = _build_heading_matcher(ch_criteria, ch_detection_enabled)
+    is_subchapter_heading = _build_heading_matcher(sch_criteria, sch_detection_enabled)
 
-    res: List[Tuple[str, str, bool, bool, Optional[str], Optional[str]]] = []
+    res: StructuredSentences = empty_structured_sentences()
+    # Per-paragraph (text, marker_base, is_ch_hd, is_subch_hd, ch_context, subch_context), sentence-split after the loop
+    paragraphs: List[Tuple[str, str, bool, bool, Optional[str], Optional[str]]] = []
     
     active_chapter_context_text = DEFAULT_CHAPTER_TITLE_FALLBACK
     active_subchapter_context_text = DEFAULT_SUBCHAPTER_TITLE_FALLBACK 
 
-    logger.info(f"--- Starting DOCX Extraction (Font Size & Centered Criteria - prep 6-tuple) ---")
+    logger.info(f"--- Starting DOCX Extraction (Font Size & Centered Criteria - columnar output) ---")
 
-    for i, para in enumerate(doc.paragraphs, 1):
-        para_full_text_cleaned = _clean(para.text) 
-        paragraph_marker_base = f"para{i}"
-        if not para_full_text_cleaned: 
-            continue
-
-        para_max_font_size_pt = 0.0
-        para_alignment_value = para.alignment 
-        if para.runs:
-            for run in para.runs:
-                if run.text.strip() and run.font.size:
-                    try: 
-                        para_max_font_size_pt = max(para_max_font_size_pt, run.font.size.pt)
-                    except AttributeError: pass 
-        current_para_props = {
-            'max_fsize_pt': para_max_font_size_pt,
-            'alignment': para_alignment_value,
-        }
+    for para_full_text_cleaned, paragraph_marker_base, para_max_font_size_pt, para_alignment_value in zip(
+            raw['text'], raw['marker'], raw['max_fsize_pt'], raw['alignment']):
+        i = paragraph_marker_base[4:] # Paragraph number, for log lines only
         
         # --- Initialize flags for THIS paragraph ---
         this_paragraph_is_chapter_heading_flag = False  # Initialize to False
@@ -90,79 +351,93 @@ def _extract_docx(data: bytes, heading_criteria: Dict[str, Dict[str, Any]]) \
         ch_context_for_sents_in_this_para = active_chapter_context_text
         subch_context_for_sents_in_this_para = active_subchapter_context_text
 
-        is_ch_match, ch_match_reason = False, "Ch criteria not fully met or not defined"
-        if ch_criteria and ch_criteria.get('min_font_size') is not None and ch_criteria.get('alignment_centered') is True:
-             is_ch_match, ch_match_reason = _matches_criteria_docx_font_size_and_centered(
-                 para_full_text_cleaned, current_para_props, ch_criteria, "Chapter"
-             )
+        is_ch_match = is_chapter_heading(para_max_font_size_pt, para_alignment_value)
         
         if is_ch_match:
             this_paragraph_is_chapter_heading_flag = True # Set if it IS a chapter
-            active_chapter_context_text = para_full_text_cleaned 
+            active_chapter_context_text = sys.intern(para_full_text_cleaned) # One shared object per title
             active_subchapter_context_text = DEFAULT_SUBCHAPTER_TITLE_FALLBACK 
             
             ch_context_for_sents_in_this_para = active_chapter_context_text
             subch_context_for_sents_in_this_para = active_subchapter_context_text
-            logger.info(f"  ==> Para {i} IS CHAPTER: '{para_full_text_cleaned[:50]}' (Reason: {ch_match_reason})")
+            if logger.isEnabledFor(logging.DEBUG):
+                _, ch_match_reason = _matches_criteria_docx_font_size_and_centered(
+                    para_max_font_size_pt, para_alignment_value, ch_criteria
+                )
+                logger.debug("  ==> Para %s chapter match reason: %s", i, ch_match_reason)
+            logger.info("  ==> Para %s IS CHAPTER: '%.50s'", i, para_full_text_cleaned)
         else:
-            is_sch_match, sch_match_reason = False, "SubCh criteria not met, disabled, or not distinct"
-            if sch_criteria and sch_criteria.get('min_font_size') is not None and sch_criteria.get('alignment_centered') is True:
-                if ch_criteria.get('min_font_size') is None or \
-                   sch_criteria.get('min_font_size',0) < ch_criteria.get('min_font_size', float('inf')):
-                    is_sch_match, sch_match_reason = _matches_criteria_docx_font_size_and_centered(
-                        para_full_text_cleaned, current_para_props, sch_criteria, "Sub-Chapter"
-                    )
+            is_sch_match = is_subchapter_heading(para_max_font_size_pt, para_alignment_value)
             
             if is_sch_match:
                 this_paragraph_is_subchapter_heading_flag = True # Set if it IS a sub-chapter
-                active_subchapter_context_text = para_full_text_cleaned 
+                active_subchapter_context_text = sys.intern(para_full_text_cleaned) 
                 
                 ch_context_for_sents_in_this_para = active_chapter_context_text 
                 subch_context_for_sents_in_this_para = active_subchapter_context_text
-                logger.info(f"  ==> Para {i} IS SUB-CHAPTER: '{para_full_text_cleaned[:50]}' (Reason: {sch_match_reason})")
+                if logger.isEnabledFor(logging.DEBUG):
+                    _, sch_match_reason = _matches_criteria_docx_font_size_and_centered(
+                        para_max_font_size_pt, para_alignment_value, sch_criteria
+                    )
+                    logger.debug("  ==> Para %s sub-chapter match reason: %s", i, sch_match_reason)
+                logger.info("  ==> Para %s IS SUB-CHAPTER: '%.50s'", i, para_full_text_cleaned)
 
-        try:
-            nltk_sentences = nltk.sent_tokenize(para_full_text_cleaned)
-            if not nltk_sentences and para_full_text_cleaned: 
-                nltk_sentences = [para_full_text_cleaned] 
-        except Exception as e:
-            logger.error(f"NLTK tokenization fail P{i} ('{para_full_text_cleaned[:30]}...'): {e}",exc_info=True)
-            nltk_sentences=[para_full_text_cleaned] if para_full_text_cleaned else []
-
-        for sent_idx, individual_sent_text in enumerate(nltk_sentences):
-             clean_individual_sent = individual_sent_text.strip()
-             if clean_individual_sent:
-                res.append((
-                    clean_individual_sent, 
-                    f"{paragraph_marker_base}.s{sent_idx}", 
-                    this_paragraph_is_chapter_heading_flag,    # Now always defined
-                    this_paragraph_is_subchapter_heading_flag, # Now always defined
-                    ch_context_for_sents_in_this_para,       
-                    subch_context_for_sents_in_this_para     
-                ))
-
-    logger.info(f"--- DOCX Extraction Finished. Total 6-tuple segments generated: {len(res)} ---")
+        paragraphs.append((
+            para_full_text_cleaned,
+            paragraph_marker_base,
+            this_paragraph_is_chapter_heading_flag,
+            this_paragraph_is_subchapter_heading_flag,
+            ch_context_for_sents_in_this_para,
+            subch_context_for_sents_in_this_para
+        ))
+
+    # --- Sentence-split body paragraphs: regex fast path, then one backend (Punkt or blingfire) pass for the rest ---
+    # Heading paragraphs are kept whole: they are short titles, not running text.
+    sentences_per_para: List[List[str]] = [[para_entry[0]] for para_entry in paragraphs]
+    punkt_para_indices: List[int] = []
+    try:
+        for idx, para_entry in enumerate(paragraphs):
+            if para_entry[2] or para_entry[3]:
+                continue
+            fast_sentences = _fast_sentence_split(para_entry[0]) if USES_NLTK_PUNKT else None
+            if fast_sentences is None:
+                punkt_para_indices.append(idx)
+            else:
+                sentences_per_para[idx] = fast_sentences
+        para_texts = [paragraphs[idx][0] for idx in punkt_para_indices]
+        for idx, para_sentences in zip(punkt_para_indices, _sent_tokenize_backend(para_texts)):
+            sentences_per_para[idx] = para_sentences
+    except Exception as e:
+        logger.error(f"Batch sentence tokenization fail ({len(punkt_para_indices)} paras): {e}", exc_info=True)
+
+    # Extend each column once per paragraph; paragraph-constant columns are extended by repetition.
+    # Every sentence list above is already stripped and non-empty: paragraph texts come out of
+    # _clean(), the fast path splits on (and so drops) whitespace runs, and _sent_tokenize_batch
+    # strips and filters its pieces. No per-sentence strip/blank check is needed here.
+    texts_extend, markers_extend = res['text'].extend, res['marker'].extend
+    is_ch_extend, is_sch_extend = res['is_ch'].extend, res['is_sch'].extend
+    ch_ctx_extend, sch_ctx_extend = res['ch_ctx'].extend, res['sch_ctx'].extend
+    for (para_full_text_cleaned, paragraph_marker_base, this_paragraph_is_chapter_heading_flag,
+         this_paragraph_is_subchapter_heading_flag, ch_context_for_sents_in_this_para,
+         subch_context_for_sents_in_this_para), nltk_sentences in zip(paragraphs, sentences_per_para):
+        sentence_marker_prefix = f"{paragraph_marker_base}.s"
+        n_kept = len(nltk_sentences)
+        texts_extend(nltk_sentences)
+        markers_extend([f"{sentence_marker_prefix}{sent_idx}" for sent_idx in range(n_kept)])
+        is_ch_extend([this_paragraph_is_chapter_heading_flag] * n_kept)
+        is_sch_extend([this_paragraph_is_subchapter_heading_flag] * n_kept)
+        ch_ctx_extend([ch_context_for_sents_in_this_para] * n_kept)
+        sch_ctx_extend([subch_context_for_sents_in_this_para] * n_kept)
+
+    logger.info(f"--- DOCX Extraction Finished. Total sentence rows generated: {len(res['text'])} ---")
     return res
 
-def extract_sentences_with_structure(*, file_content: bytes, filename: str, heading_criteria: Dict[str, Dict[str, Any]]) -> List[Tuple[str, str, bool, bool, Optional[str], Optional[str]]]:
+def extract_sentences_with_structure(*, file_content: bytes, filename: str, heading_criteria: HeadingCriteriaByLevel,
+                                     paragraph_extractor: Callable[[bytes], RawParagraphs] = extract_raw_paragraphs) -> StructuredSentences:
     file_ext = filename.lower().rsplit(".", 1)[-1] if isinstance(filename, str) and '.' in filename else ""
     if not file_ext: raise ValueError("Invalid or extensionless filename provided")
     if file_ext != "docx": raise ValueError(f"Unsupported file type: {file_ext}. Expected DOCX.")
-            
-    clean_ch_criteria = {}
-    raw_ch_crit = heading_criteria.get("chapter", {}) 
-    if raw_ch_crit.get('min_font_size') is not None and raw_ch_crit.get('alignment_centered') is True:
-        clean_ch_criteria['min_font_size'] = raw_ch_crit['min_font_size']
-        clean_ch_criteria['alignment_centered'] = True 
-    
-    clean_sch_criteria = {}
-    raw_sch_crit = heading_criteria.get("sub_chapter", {}) 
-    if raw_sch_crit: 
-        if raw_sch_crit.get('min_font_size') is not None and raw_sch_crit.get('alignment_centered') is True:
-            clean_sch_criteria['min_font_size'] = raw_sch_crit['min_font_size']
-            clean_sch_criteria['alignment_centered'] = True
-            
-    final_criteria_to_pass = {"chapter": clean_ch_criteria, "sub_chapter": clean_sch_criteria}
-    
-    output_data = _extract_docx(data=file_content, heading_criteria=final_criteria_to_pass)
+
+    raw_paragraphs = paragraph_extractor(file_content)
+    output_data = _apply_heading_criteria(raw_paragraphs, heading_criteria=heading_criteria)
     return output_data
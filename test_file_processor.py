@@ -0,0 +1,112 @@
+import importlib
+import sys
+import types
+
+import pytest
+from nltk.tokenize.punkt import PunktParameters, PunktSentenceTokenizer
+
+import file_processor
+
+
+@pytest.fixture
+def punkt_model(monkeypatch):
+    """A small Punkt model with known abbreviations, used in place of the downloaded english.pickle."""
+    params = PunktParameters()
+    params.abbrev_types = {"vol", "dr", "u.s", "etc", "mr", "e.g", "approx", "dept", "govt", "assoc", "prof", "sept", "gov"}
+    model = PunktSentenceTokenizer(params)
+    monkeypatch.setattr(file_processor, "load_punkt_model", lambda: model)
+    file_processor._punkt_abbrev_types.cache_clear()
+    yield model
+    file_processor._punkt_abbrev_types.cache_clear()
+
+
+@pytest.fixture
+def reload_file_processor(monkeypatch):
+    """Re-imports file_processor under patched env/modules and restores the real module afterwards."""
+    def reload(splitter=None, blingfire_installed=False):
+        if splitter is None:
+            monkeypatch.delenv(file_processor.SENTENCE_SPLITTER_ENV, raising=False)
+        else:
+            monkeypatch.setenv(file_processor.SENTENCE_SPLITTER_ENV, splitter)
+        if blingfire_installed:
+            fake_blingfire = types.ModuleType("blingfire")
+            fake_blingfire.text_to_sentences = lambda text: text
+            monkeypatch.setitem(sys.modules, "blingfire", fake_blingfire)
+        else:
+            monkeypatch.setitem(sys.modules, "blingfire", None) # import raises ImportError
+        return importlib.reload(file_processor)
+    yield reload
+    monkeypatch.undo()
+    importlib.reload(file_processor)
+
+
+# --- Sentence splitter backend selection ---
+def test_punkt_is_default_even_when_blingfire_is_installed(reload_file_processor):
+    fp = reload_file_processor(blingfire_installed=True)
+    assert fp.SENTENCE_SPLITTER == "punkt"
+    assert fp.USES_NLTK_PUNKT
+    assert fp._sent_tokenize_backend is fp._sent_tokenize_batch
+
+def test_blingfire_is_used_only_when_opted_in(reload_file_processor):
+    fp = reload_file_processor(splitter="blingfire", blingfire_installed=True)
+    assert fp.SENTENCE_SPLITTER == "blingfire"
+    assert not fp.USES_NLTK_PUNKT
+    assert fp._sent_tokenize_backend is fp._blingfire_sent_tokenize_batch
+
+@pytest.mark.parametrize("splitter", ["blingfire", "spacy"])
+def test_unavailable_or_unknown_splitter_falls_back_to_punkt(reload_file_processor, splitter):
+    fp = reload_file_processor(splitter=splitter, blingfire_installed=False)
+    assert fp.SENTENCE_SPLITTER == "punkt"
+    assert fp._sent_tokenize_backend is fp._sent_tokenize_batch
+
+
+# --- Batched Punkt splitting ---
+@pytest.mark.parametrize("paragraph", [
+    "See page 4 of the vol.!",
+    "Ask the Dr.?",
+    'He moved to the U.S.".',
+    "He saw the house.!",
+    "What a day!!",
+    "It ended, etc.",
+    '" Wait," she called. Nobody answered.', # Leading closing quote is not realigned onto the previous paragraph
+    ") As noted above. It holds.",
+])
+def test_batch_matches_per_paragraph_punkt_for_paragraph_final_punctuation(punkt_model, paragraph):
+    para_texts = ["First sentence. Second one.", paragraph, "Next paragraph starts here. It goes on."]
+    expected = [punkt_model.tokenize(text) for text in para_texts]
+    assert file_processor._sent_tokenize_batch(para_texts) == expected
+
+def test_batch_handles_long_dot_leaders(punkt_model):
+    # Table-of-contents lines; the stacked-punctuation check must stay linear in the run length
+    para_texts = ["Contents.", "Chapter One: The Beginning " + "." * 5000 + " 12", "Chapter Two " + "." * 5000]
+    expected = [punkt_model.tokenize(text) for text in para_texts]
+    assert file_processor._sent_tokenize_batch(para_texts) == expected
+
+
+# --- Regex fast path ---
+@pytest.mark.parametrize("text, uses_fast_path", [
+    ("The meeting lasted hours. Everyone departed early.", True),
+    ("Questions remained! Nobody answered? Somebody laughed.", True),
+    ("He paid approx. twenty dollars. Then everyone departed.", False), # Known abbreviation
+    ("The assoc. members voted yesterday. Results followed quickly.", False),
+    ("Prices rose approx. tenfold! Buyers panicked immediately.", False),
+    ("Call Dr. Smith tomorrow. Patients waited.", False), # Short word before the period
+    ("The lecture (Prof. Adams presiding) ran overtime. Everyone stayed.", False), # Punkt drops the "(" before "Prof."
+    ('She quoted "Prof. Adams" approvingly. Everyone stayed.', False),
+    ("Our ex-Gov. Smith spoke today. Everyone listened.", False), # Punkt also checks the part after the last hyphen
+    ("Our ex-colleagues. Everyone stayed.", True), # Neither "ex-colleagues" nor "colleagues" is an abbreviation
+])
+def test_fast_path_agrees_with_punkt(punkt_model, text, uses_fast_path):
+    fast_sentences = file_processor._fast_sentence_split(text)
+    assert (fast_sentences is not None) == uses_fast_path
+    if fast_sentences is not None:
+        assert fast_sentences == punkt_model.tokenize(text)
+
+def test_fast_path_falls_back_when_punkt_abbreviations_are_unavailable(monkeypatch):
+    monkeypatch.setattr(file_processor, "load_punkt_model", lambda: PunktSentenceTokenizer.__new__(PunktSentenceTokenizer))
+    file_processor._punkt_abbrev_types.cache_clear()
+    try:
+        assert file_processor._fast_sentence_split("The meeting lasted hours. Everyone departed early.") is None
+        assert file_processor._fast_sentence_split("No sentence end here") == ["No sentence end here"]
+    finally:
+        file_processor._punkt_abbrev_types.cache_clear()
@@ -1,8 +1,16 @@
 import nltk
 import tiktoken
 import streamlit as st
+import io
+import gzip
 import logging
 import os
+from typing import TYPE_CHECKING
+from file_processor import extract_raw_paragraphs, extract_sentences_with_structure, HeadingCriteriaByLevel, SENTENCE_SPLITTER, USES_NLTK_PUNKT, load_punkt_model
+from chunker import chunk_structured_sentences, chunk_by_chapter, empty_chunks
+
+if TYPE_CHECKING: # pandas/pyarrow are imported on first use; they are not needed to render the upload page
+    import pandas as pd
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -10,7 +18,16 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 # --- NLTK Setup ---
 @st.cache_resource
 def ensure_nltk_punkt():
-    """Downloads the NLTK 'punkt' tokenizer models if not already downloaded."""
+    """Prepares the configured sentence splitter once per process.
+
+    With the default Punkt splitter, downloads the NLTK 'punkt' models if needed and returns the
+    loaded Punkt model. When blingfire was opted into (APP_SENTENCE_SPLITTER=blingfire), Punkt is
+    never used, so the check and load are skipped and None is returned.
+    """
+    logging.info(f"Sentence splitter: {SENTENCE_SPLITTER}")
+    if not USES_NLTK_PUNKT:
+        logging.info("NLTK 'punkt' is not needed with the blingfire splitter.")
+        return None
     try:
         nltk.data.find('tokenizers/punkt')
         logging.info("NLTK 'punkt' tokenizer already available.")
@@ -39,6 +56,9 @@ def ensure_nltk_punkt():
         logging.error(f"An unexpected error occurred while checking for NLTK data: {ex}", exc_info=True)
         st.stop()
 
+    # Load the Punkt model itself once per process here, instead of on the first Process click.
+    return load_punkt_model()
+
 
 # --- Tiktoken Setup ---
 @st.cache_resource
@@ -52,3 +72,67 @@ def load_tokenizer(encoding_name="cl100k_base"):
         st.error(f"Failed to load tiktoken tokenizer '{encoding_name}': {e}")
         logging.error(f"Failed to load tiktoken tokenizer '{encoding_name}': {e}", exc_info=True)
         st.stop()
+
+
+# --- DOCX Parse Cache ---
+@st.cache_data(max_entries=4, show_spinner=False)
+def load_docx_paragraphs(file_content: bytes):
+    """Parses DOCX bytes into paragraph columns, cached on the file content.
+
+    Re-processing the same upload with other heading criteria or chunk mode skips the XML parse.
+    """
+    return extract_raw_paragraphs(file_content)
+
+
+# --- Extraction + Chunking Cache ---
+@st.cache_data(max_entries=4, show_spinner=False)
+def load_structured_sentences(file_content: bytes, filename: str, heading_criteria: HeadingCriteriaByLevel):
+    """Sentence extraction cached on the file content and heading criteria.
+
+    Switching chunk mode only re-runs chunking on these cached sentences.
+    """
+    return extract_sentences_with_structure(
+        file_content=file_content, filename=filename, heading_criteria=heading_criteria,
+        paragraph_extractor=load_docx_paragraphs
+    )
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def extract_and_chunk(file_content: bytes, filename: str, heading_criteria: HeadingCriteriaByLevel, chunk_by_tokens: bool,
+                      target_tokens: int, overlap_sentences: int, _tokenizer):
+    """Runs extraction and chunking, cached on the file bytes and every setting that shapes the chunks.
+
+    Returns (number of extracted sentences, chunk columns). The tokenizer is the process-wide
+    cached resource, so it is left out of the cache key (leading underscore).
+    """
+    structured_sentences = load_structured_sentences(file_content, filename, heading_criteria)
+    if not structured_sentences['text']:
+        return 0, empty_chunks()
+    if chunk_by_tokens:
+        chunks = chunk_structured_sentences(
+            structured_data=structured_sentences, tokenizer=_tokenizer,
+            target_tokens=target_tokens, overlap_sentences=overlap_sentences
+        )
+    else:
+        chunks = chunk_by_chapter(structured_data=structured_sentences)
+    return len(structured_sentences['text']), chunks
+
+# --- CSV Export Cache ---
+@st.cache_data(max_entries=4, show_spinner=False)
+def dataframe_to_csv_bytes(df: "pd.DataFrame", gzip_compress: bool = False) -> bytes:
+    """Serializes the chunk table to UTF-8 CSV bytes once per distinct table.
+
+    Uses Arrow's C++ CSV writer (all string fields quoted) straight into a bytes buffer;
+    reruns that only redraw the download button get the cached bytes back. With
+    gzip_compress the CSV is streamed through a fast (level 1) gzip writer instead.
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    csv_buffer = io.BytesIO()
+    if gzip_compress:
+        with gzip.GzipFile(fileobj=csv_buffer, mode='wb', compresslevel=1, mtime=0) as gz:
+            pa_csv.write_csv(table, gz)
+    else:
+        pa_csv.write_csv(table, csv_buffer)
+    return csv_buffer.getvalue()